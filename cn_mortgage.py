@@ -1,12 +1,21 @@
+import math
 from dataclasses import dataclass
 from typing import Dict, List, Tuple
+import io
+import sys
 import colorama
 from colorama import Fore, Style
-from tabulate import tabulate
+from table_format import format_table_grid
 from datetime import date, datetime
 
-# 初始化colorama
-colorama.init()
+# 仅在终端输出时着色；Windows终端需要colorama转换ANSI转义码
+_USE_COLOR = sys.stdout.isatty()
+if _USE_COLOR and sys.platform == 'win32':
+    colorama.init()
+
+def _color(code: str) -> str:
+    """非终端输出时返回空串，跳过ANSI转义码"""
+    return code if _USE_COLOR else ''
 
 @dataclass
 class LoanConstants:
@@ -70,22 +79,28 @@ class LoanCalculator:
         # 月利率
         self.monthly_commercial_rate = commercial_rate / 12
         self.monthly_fund_rate = fund_rate / 12
-
-    def calculate_equal_installment(self) -> Dict:
-        """计算等额本息还款"""
-        # 商业贷款月供
-        commercial_monthly = self._equal_installment_payment(
-            self.commercial_amount, 
-            self.monthly_commercial_rate, 
+        
+        # 两种还款方式共用的中间量，只计算一次
+        self._commercial_monthly_principal = self.commercial_amount / self.months if self.commercial_amount > 0 else 0
+        self._fund_monthly_principal = self.fund_amount / self.months if self.fund_amount > 0 else 0
+        self._commercial_installment = self._equal_installment_payment(
+            self.commercial_amount,
+            self.monthly_commercial_rate,
             self.months
         ) if self.commercial_amount > 0 else 0
-        
-        # 公积金贷款月供
-        fund_monthly = self._equal_installment_payment(
+        self._fund_installment = self._equal_installment_payment(
             self.fund_amount,
             self.monthly_fund_rate,
             self.months
         ) if self.fund_amount > 0 else 0
+
+    def calculate_equal_installment(self) -> Dict:
+        """计算等额本息还款"""
+        # 商业贷款月供
+        commercial_monthly = self._commercial_installment
+        
+        # 公积金贷款月供
+        fund_monthly = self._fund_installment
         
         # 总月供
         total_monthly = commercial_monthly + fund_monthly
@@ -107,8 +122,8 @@ class LoanCalculator:
     def calculate_equal_principal(self) -> Dict:
         """计算等额本金还款"""
         # 每月本金
-        monthly_commercial_principal = self.commercial_amount / self.months if self.commercial_amount > 0 else 0
-        monthly_fund_principal = self.fund_amount / self.months if self.fund_amount > 0 else 0
+        monthly_commercial_principal = self._commercial_monthly_principal
+        monthly_fund_principal = self._fund_monthly_principal
         
         # 计算首月利息
         first_month_commercial_interest = self.commercial_amount * self.monthly_commercial_rate if self.commercial_amount > 0 else 0
@@ -126,11 +141,11 @@ class LoanCalculator:
         last_month_payment = (monthly_commercial_principal + first_month_commercial_interest - commercial_decrease * (self.months - 1) +
                             monthly_fund_principal + first_month_fund_interest - fund_decrease * (self.months - 1))
         
-        # 计算总利息
-        total_commercial_interest = (first_month_commercial_interest * self.months - 
-                                   commercial_decrease * (self.months - 1) * self.months / 2) if self.commercial_amount > 0 else 0
-        total_fund_interest = (first_month_fund_interest * self.months - 
-                             fund_decrease * (self.months - 1) * self.months / 2) if self.fund_amount > 0 else 0
+        # 计算总利息：各月利息为等差数列，求和得 本金*月利率*(月数+1)/2，无需相减
+        total_commercial_interest = (self.commercial_amount * self.monthly_commercial_rate *
+                                   (self.months + 1) / 2) if self.commercial_amount > 0 else 0
+        total_fund_interest = (self.fund_amount * self.monthly_fund_rate *
+                             (self.months + 1) / 2) if self.fund_amount > 0 else 0
         
         return {
             "first_month_payment": first_month_payment,
@@ -142,12 +157,87 @@ class LoanCalculator:
             "total_payment": self.total_amount + total_commercial_interest + total_fund_interest
         }
 
+    def schedule(self) -> Dict[str, List[float]]:
+        """生成等额本息逐月还款计划"""
+        commercial = self._installment_schedule(
+            self.commercial_amount,
+            self.monthly_commercial_rate,
+            self.months,
+            self._commercial_installment
+        )
+        fund = self._installment_schedule(
+            self.fund_amount,
+            self.monthly_fund_rate,
+            self.months,
+            self._fund_installment
+        )
+        
+        # 合并商业贷款与公积金贷款的逐月数据
+        return {
+            key: [c + f for c, f in zip(commercial[key], fund[key])]
+            for key in ("payment", "principal", "interest", "balance")
+        }
+
+    @staticmethod
+    def _installment_schedule(principal: float, monthly_rate: float, months: int,
+                              monthly: float) -> Dict[str, List[float]]:
+        """按闭式公式计算单笔贷款的逐月还款计划"""
+        if principal <= 0:
+            zeros = [0.0] * months
+            return {"payment": zeros, "principal": zeros, "interest": zeros, "balance": zeros}
+        
+        # 第k期末剩余本金：B_k = B_0*(1+r)^k - P*((1+r)^k - 1)/r，各期互不依赖
+        if monthly_rate == 0:
+            balances = [principal - monthly * k for k in range(months + 1)]
+        else:
+            growth = [(1 + monthly_rate) ** k for k in range(months + 1)]
+            balances = [principal * g - monthly * (g - 1) / monthly_rate for g in growth]
+        balances[-1] = 0.0  # 消除末期浮点残差
+        
+        interest = [b * monthly_rate for b in balances[:-1]]
+        return {
+            "payment": [monthly] * months,
+            "principal": [monthly - i for i in interest],
+            "interest": interest,
+            "balance": balances[1:]
+        }
+
+    @classmethod
+    def batch_equal_installment(cls, principals, rates, months) -> List[float]:
+        """
+        批量计算等额本息月供（用于利率、年限敏感性分析）
+        :param principals: 贷款本金，标量或序列
+        :param rates: 贷款年利率，标量或序列
+        :param months: 还款月数，标量或序列
+        :return: 各情景的月供列表
+        """
+        return [
+            cls._equal_installment_payment(principal, rate / 12, n)
+            for principal, rate, n in _broadcast(principals, rates, months)
+        ]
+
     @staticmethod
     def _equal_installment_payment(principal: float, monthly_rate: float, months: int) -> float:
         """计算等额本息月供"""
         if monthly_rate == 0:
             return principal / months
-        return principal * (monthly_rate * (1 + monthly_rate) ** months) / ((1 + monthly_rate) ** months - 1)
+        return _pmt(principal, monthly_rate, months)
+
+def _pmt(principal: float, monthly_rate: float, months: int) -> float:
+    """等额本息月供核心公式（月利率非零）"""
+    # growth - 1 = (1+r)^n - 1 直接由expm1求得，避免月利率很小时的相消误差
+    growth_minus_one = math.expm1(months * math.log1p(monthly_rate))
+    return principal * monthly_rate * (growth_minus_one + 1) / growth_minus_one
+
+def _broadcast(*args) -> List[Tuple]:
+    """将标量与等长序列对齐为逐情景的参数元组"""
+    columns = [list(arg) if isinstance(arg, (list, tuple, range)) else None for arg in args]
+    lengths = {len(col) for col in columns if col is not None}
+    if len(lengths) > 1:
+        raise ValueError("批量参数长度不一致")
+    size = lengths.pop() if lengths else 1
+    columns = [col if col is not None else [arg] * size for col, arg in zip(columns, args)]
+    return list(zip(*columns))
 
 def format_money(amount: float) -> str:
     """格式化金额输出"""
@@ -189,17 +279,19 @@ def print_loan_details(calculator: LoanCalculator):
         ]
     }
     
-    print(f"\n{Fore.CYAN}{'='*20} 房贷计算结果 {'='*20}{Style.RESET_ALL}")
+    # 整份报告先写入缓冲区，最后一次性输出
+    buf = io.StringIO()
+    print(f"\n{_color(Fore.CYAN)}{'='*20} 房贷计算结果 {'='*20}{_color(Style.RESET_ALL)}", file=buf)
     
     for title, data in tables.items():
-        print(f"\n{Fore.GREEN}{title}{Style.RESET_ALL}")
-        print(tabulate(data, headers=["项目", "金额"], 
-                      tablefmt="grid", numalign="right"))
+        print(f"\n{_color(Fore.GREEN)}{title}{_color(Style.RESET_ALL)}", file=buf)
+        print(format_table_grid(data, headers=["项目", "金额"]), file=buf)
+    sys.stdout.write(buf.getvalue())
 
 def main():
     """主函数"""
     try:
-        print(f"{Fore.CYAN}房贷计算器 (2024){Style.RESET_ALL}")
+        print(f"{_color(Fore.CYAN)}房贷计算器 (2024){_color(Style.RESET_ALL)}")
         house_price = float(input("请输入房屋总价（万元）：")) * 10000
         down_payment_ratio = float(input("请输入首付比例（如：0.3 表示30%）："))
         monthly_fund_deposit = float(input("请输入月公积金缴存额（元）："))
@@ -226,11 +318,11 @@ def main():
         print_loan_details(calculator)
         
     except ValueError as e:
-        print(f"{Fore.RED}错误：{str(e)}{Style.RESET_ALL}")
+        print(f"{_color(Fore.RED)}错误：{str(e)}{_color(Style.RESET_ALL)}")
     except KeyboardInterrupt:
-        print(f"\n{Fore.YELLOW}程序已终止{Style.RESET_ALL}")
+        print(f"\n{_color(Fore.YELLOW)}程序已终止{_color(Style.RESET_ALL)}")
     except Exception as e:
-        print(f"{Fore.RED}发生错误：{str(e)}{Style.RESET_ALL}")
+        print(f"{_color(Fore.RED)}发生错误：{str(e)}{_color(Style.RESET_ALL)}")
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
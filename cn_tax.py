@@ -1,11 +1,22 @@
+from bisect import bisect_right
 from dataclasses import dataclass
-from typing import Dict
+from functools import lru_cache
+from itertools import accumulate
+from typing import Dict, List, NamedTuple, Sequence
+import io
+import sys
 import colorama
 from colorama import Fore, Style
-from tabulate import tabulate
+from table_format import format_table_grid
 
-# 初始化colorama
-colorama.init()
+# 仅在终端输出时着色；Windows终端需要colorama转换ANSI转义码
+_USE_COLOR = sys.stdout.isatty()
+if _USE_COLOR and sys.platform == 'win32':
+    colorama.init()
+
+def _color(code: str) -> str:
+    """非终端输出时返回空串，跳过ANSI转义码"""
+    return code if _USE_COLOR else ''
 
 @dataclass
 class TaxConstants:
@@ -64,16 +75,44 @@ class TaxConstants:
         ELDERLY_CARE = 2000     # 赡养老人（独生子女最高）
         
         # 城市分类
-        TIER_1_CITIES = ['北京', '上海', '广州', '深圳']
-        TIER_2_CITIES = [
+        TIER_1_CITIES = frozenset({'北京', '上海', '广州', '深圳'})
+        TIER_2_CITIES = frozenset({
             '天津', '重庆', '南京', '杭州', '武汉', '成都', '西安',
             '济南', '长春', '哈尔滨', '沈阳', '南宁', '昆明', '合肥',
             '郑州', '福州', '南昌', '长沙', '贵阳', '兰州', '西宁',
             '呼和浩特', '乌鲁木齐', '拉萨', '银川', '石家庄',
-            '大连', '青岛', '宁波', '厦门', '深圳'
-        ]
+            '大连', '青岛', '宁波', '厦门'
+        })
 
-@dataclass
+# 税率表按列拆分为下限、上限、税率，另存下限处累计税额，用于二分查找所在税级
+_BRACKET_LOWERS = tuple(lower for lower, _, _ in TaxConstants.TAX_BRACKETS)
+_BRACKET_UPPERS = tuple(upper for _, upper, _ in TaxConstants.TAX_BRACKETS)
+_BRACKET_RATES = tuple(rate for _, _, rate in TaxConstants.TAX_BRACKETS)
+_BRACKET_CUM_TAX = tuple(accumulate(
+    ((upper - lower) * rate for lower, upper, rate in TaxConstants.TAX_BRACKETS[:-1]),
+    initial=0.0
+))
+
+# 个人与企业五险一金费率，按计算顺序排列
+_PERSONAL_RATES = (
+    TaxConstants.PENSION_RATE,
+    TaxConstants.MEDICAL_RATE,
+    TaxConstants.UNEMPLOYMENT_RATE,
+    TaxConstants.HOUSING_FUND_RATE
+)
+_EMPLOYER_RATES = (
+    TaxConstants.EMPLOYER_PENSION_RATE,
+    TaxConstants.EMPLOYER_MEDICAL_RATE,
+    TaxConstants.EMPLOYER_UNEMPLOYMENT_RATE,
+    TaxConstants.EMPLOYER_INJURY_RATE,
+    TaxConstants.EMPLOYER_MATERNITY_RATE,
+    TaxConstants.EMPLOYER_HOUSING_FUND_RATE
+)
+
+# 个人社保合计费率（养老+医疗+失业）
+_INSURANCE_RATE = TaxConstants.PENSION_RATE + TaxConstants.MEDICAL_RATE + TaxConstants.UNEMPLOYMENT_RATE
+
+@dataclass(frozen=True)
 class SpecialDeductions:
     """专项附加扣除"""
     housing_rent: float = 0      # 住房租金，最高1500/月
@@ -83,25 +122,54 @@ class SpecialDeductions:
     elderly_care: float = 0      # 赡养老人，最高2000/月
     medical_expense: float = 0   # 大病医疗
 
+class TaxResult(NamedTuple):
+    """个税计算结果（扁平结构）"""
+    gross_salary: float
+    insurance_base: float
+    personal_pension: float
+    personal_medical: float
+    personal_unemployment: float
+    personal_housing_fund: float
+    personal_insurance_total: float
+    employer_pension: float
+    employer_medical: float
+    employer_unemployment: float
+    employer_injury: float
+    employer_maternity: float
+    employer_housing_fund: float
+    employer_insurance_total: float
+    special_deductions: float
+    taxable_income: float
+    tax: float
+    net_income: float
+
 def calculate_social_insurance(monthly_salary: float) -> Dict[str, float]:
-    """计算社保和公积金"""
+    """计算社保和公积金（结果为缓存共享对象，请勿修改）"""
     # 确定计算基数
     base = min(max(monthly_salary, TaxConstants.SOCIAL_INSURANCE_BASE_MIN), 
               TaxConstants.SOCIAL_INSURANCE_BASE_MAX)
+    return _calc_insurance_cached(base)
+
+@lru_cache(maxsize=4096)
+def _calc_insurance_cached(base: float) -> Dict[str, float]:
+    """按已截断的缴费基数计算社保和公积金，基数上下限以外的工资共用缓存"""
+    pension_rate, medical_rate, unemployment_rate, housing_fund_rate = _PERSONAL_RATES
+    (employer_pension_rate, employer_medical_rate, employer_unemployment_rate,
+     employer_injury_rate, employer_maternity_rate, employer_housing_fund_rate) = _EMPLOYER_RATES
     
     # 个人缴纳部分
-    pension = base * TaxConstants.PENSION_RATE
-    medical = base * TaxConstants.MEDICAL_RATE
-    unemployment = base * TaxConstants.UNEMPLOYMENT_RATE
-    housing_fund = base * TaxConstants.HOUSING_FUND_RATE
+    pension = base * pension_rate
+    medical = base * medical_rate
+    unemployment = base * unemployment_rate
+    housing_fund = base * housing_fund_rate
     
     # 企业缴纳部分
-    employer_pension = base * TaxConstants.EMPLOYER_PENSION_RATE
-    employer_medical = base * TaxConstants.EMPLOYER_MEDICAL_RATE
-    employer_unemployment = base * TaxConstants.EMPLOYER_UNEMPLOYMENT_RATE
-    employer_injury = base * TaxConstants.EMPLOYER_INJURY_RATE
-    employer_maternity = base * TaxConstants.EMPLOYER_MATERNITY_RATE
-    employer_housing_fund = base * TaxConstants.EMPLOYER_HOUSING_FUND_RATE
+    employer_pension = base * employer_pension_rate
+    employer_medical = base * employer_medical_rate
+    employer_unemployment = base * employer_unemployment_rate
+    employer_injury = base * employer_injury_rate
+    employer_maternity = base * employer_maternity_rate
+    employer_housing_fund = base * employer_housing_fund_rate
     
     personal_total = pension + medical + unemployment + housing_fund
     employer_total = (employer_pension + employer_medical + employer_unemployment + 
@@ -131,24 +199,15 @@ def calculate_marginal_rates(monthly_salary: float) -> Dict[str, float]:
     """计算边际税率"""
     annual_income = monthly_salary * 12
     
-    # 个税边际税率
-    tax_rate = 0
-    for lower, upper, rate in TaxConstants.TAX_BRACKETS:
-        if lower <= annual_income <= upper:
-            tax_rate = rate
-            break
+    # 个税边际税率：第一个上限大于年收入的税级（恰好位于税级边界时，下一元按更高税级计税）
+    idx = min(bisect_right(_BRACKET_UPPERS, annual_income), len(_BRACKET_RATES) - 1)
+    tax_rate = _BRACKET_RATES[idx]
     
     # 社保边际税率（如果未达到上限）
-    insurance_rate = 0
-    if monthly_salary <= TaxConstants.SOCIAL_INSURANCE_BASE_MAX:
-        insurance_rate = (TaxConstants.PENSION_RATE + 
-                         TaxConstants.MEDICAL_RATE + 
-                         TaxConstants.UNEMPLOYMENT_RATE)
+    insurance_rate = _INSURANCE_RATE if monthly_salary <= TaxConstants.SOCIAL_INSURANCE_BASE_MAX else 0
     
     # 公积金边际税率（如果未达到上限）
-    housing_fund_rate = 0
-    if monthly_salary <= TaxConstants.HOUSING_FUND_BASE_MAX:
-        housing_fund_rate = TaxConstants.HOUSING_FUND_RATE
+    housing_fund_rate = TaxConstants.HOUSING_FUND_RATE if monthly_salary <= TaxConstants.HOUSING_FUND_BASE_MAX else 0
     
     total_rate = tax_rate + insurance_rate + housing_fund_rate
     
@@ -159,7 +218,15 @@ def calculate_marginal_rates(monthly_salary: float) -> Dict[str, float]:
         "total": total_rate
     }
 
-def calculate_tax(monthly_salary: float, deductions: SpecialDeductions) -> Dict[str, float]:
+def calculate_annual_income_tax(annual_taxable: float) -> float:
+    """按累进税率表计算全年应纳个人所得税"""
+    if annual_taxable <= 0:
+        return 0
+    idx = bisect_right(_BRACKET_LOWERS, annual_taxable) - 1
+    return _BRACKET_CUM_TAX[idx] + (annual_taxable - _BRACKET_LOWERS[idx]) * _BRACKET_RATES[idx]
+
+@lru_cache(maxsize=4096)
+def calculate_tax(monthly_salary: float, deductions: SpecialDeductions) -> TaxResult:
     """计算个人所得税"""
     # 计算社保和公积金
     insurance = calculate_social_insurance(monthly_salary)
@@ -181,66 +248,78 @@ def calculate_tax(monthly_salary: float, deductions: SpecialDeductions) -> Dict[
                      special_deductions)
     
     # 计算税额
-    tax = 0
-    if taxable_income > 0:
-        annual_taxable = taxable_income * 12
-        for lower, upper, rate in TaxConstants.TAX_BRACKETS:
-            if annual_taxable > lower:
-                tax_part = min(annual_taxable - lower, upper - lower) * rate
-                tax += tax_part
+    tax = calculate_annual_income_tax(taxable_income * 12)
     
     monthly_tax = tax / 12
     net_income = monthly_salary - monthly_tax - insurance["personal"]["total"]
     
-    return {
-        "gross_salary": monthly_salary,
-        "insurance": insurance,
-        "special_deductions": special_deductions,
-        "taxable_income": taxable_income,
-        "tax": monthly_tax,
-        "net_income": net_income
-    }
+    personal = insurance["personal"]
+    employer = insurance["employer"]
+    return TaxResult(
+        gross_salary=monthly_salary,
+        insurance_base=insurance["base"],
+        personal_pension=personal["pension"],
+        personal_medical=personal["medical"],
+        personal_unemployment=personal["unemployment"],
+        personal_housing_fund=personal["housing_fund"],
+        personal_insurance_total=personal["total"],
+        employer_pension=employer["pension"],
+        employer_medical=employer["medical"],
+        employer_unemployment=employer["unemployment"],
+        employer_injury=employer["injury"],
+        employer_maternity=employer["maternity"],
+        employer_housing_fund=employer["housing_fund"],
+        employer_insurance_total=employer["total"],
+        special_deductions=special_deductions,
+        taxable_income=taxable_income,
+        tax=monthly_tax,
+        net_income=net_income
+    )
+
+def calculate_tax_batch(monthly_salaries: Sequence[float], deductions: SpecialDeductions) -> List[TaxResult]:
+    """批量计算多名员工的个人所得税（专项附加扣除相同）"""
+    return [calculate_tax(monthly_salary, deductions) for monthly_salary in monthly_salaries]
 
-def print_tax_details(results: Dict[str, float]):
+def print_tax_details(results: TaxResult):
     """打印税收详情"""
-    monthly_salary = results["gross_salary"]
+    monthly_salary = results.gross_salary
     total_cost = (monthly_salary + 
-                 results["insurance"]["employer"]["total"])
+                 results.employer_insurance_total)
     
     tables = {
         "收入概况": [
             ["月度工资", format_money(monthly_salary)],
-            ["计税基数", format_money(results["insurance"]["base"])]
+            ["计税基数", format_money(results.insurance_base)]
         ],
         
         "个人缴纳五险一金": [
-            ["养老保险", format_money(results["insurance"]["personal"]["pension"])],
-            ["医疗保险", format_money(results["insurance"]["personal"]["medical"])],
-            ["失业保险", format_money(results["insurance"]["personal"]["unemployment"])],
-            ["住房公积金", format_money(results["insurance"]["personal"]["housing_fund"])],
-            ["合计", format_money(results["insurance"]["personal"]["total"])]
+            ["养老保险", format_money(results.personal_pension)],
+            ["医疗保险", format_money(results.personal_medical)],
+            ["失业保险", format_money(results.personal_unemployment)],
+            ["住房公积金", format_money(results.personal_housing_fund)],
+            ["合计", format_money(results.personal_insurance_total)]
         ],
         
         "企业缴纳五险一金": [
-            ["养老保险", format_money(results["insurance"]["employer"]["pension"])],
-            ["医疗保险", format_money(results["insurance"]["employer"]["medical"])],
-            ["失业保险", format_money(results["insurance"]["employer"]["unemployment"])],
-            ["工伤保险", format_money(results["insurance"]["employer"]["injury"])],
-            ["生育保险", format_money(results["insurance"]["employer"]["maternity"])],
-            ["住房公积金", format_money(results["insurance"]["employer"]["housing_fund"])],
-            ["合计", format_money(results["insurance"]["employer"]["total"])]
+            ["养老保险", format_money(results.employer_pension)],
+            ["医疗保险", format_money(results.employer_medical)],
+            ["失业保险", format_money(results.employer_unemployment)],
+            ["工伤保险", format_money(results.employer_injury)],
+            ["生育保险", format_money(results.employer_maternity)],
+            ["住房公积金", format_money(results.employer_housing_fund)],
+            ["合计", format_money(results.employer_insurance_total)]
         ],
         
         "个税计算": [
-            ["应纳税所得额", format_money(results["taxable_income"])],
-            ["专项附加扣除", format_money(results["special_deductions"])],
-            ["个人所得税", format_money(results["tax"])]
+            ["应纳税所得额", format_money(results.taxable_income)],
+            ["专项附加扣除", format_money(results.special_deductions)],
+            ["个人所得税", format_money(results.tax)]
         ],
         
         "最终收入": [
             ["税前月收入", format_money(monthly_salary)],
-            ["税后月收入", format_money(results["net_income"])],
-            ["年度税后收入", format_money(results["net_income"] * 12)],
+            ["税后月收入", format_money(results.net_income)],
+            ["年度税后收入", format_money(results.net_income * 12)],
             ["企业总成本", format_money(total_cost)]
         ]
     }
@@ -255,22 +334,24 @@ def print_tax_details(results: Dict[str, float]):
     ]
     
     # 计算总体税负率
-    total_deductions = (results["tax"] + 
-                       results["insurance"]["personal"]["total"] + 
-                       results["insurance"]["employer"]["total"])
+    total_deductions = (results.tax + 
+                       results.personal_insurance_total + 
+                       results.employer_insurance_total)
     total_tax_rate = total_deductions / total_cost
     
     tables["总体税负分析"] = [
-        ["个人所得税率", format_percent(results["tax"] / monthly_salary)],
-        ["个人五险一金率", format_percent(results["insurance"]["personal"]["total"] / monthly_salary)],
-        ["企业五险一金率", format_percent(results["insurance"]["employer"]["total"] / monthly_salary)],
+        ["个人所得税率", format_percent(results.tax / monthly_salary)],
+        ["个人五险一金率", format_percent(results.personal_insurance_total / monthly_salary)],
+        ["企业五险一金率", format_percent(results.employer_insurance_total / monthly_salary)],
         ["总体税负率", format_percent(total_tax_rate)]
     ]
     
+    # 整份报告先写入缓冲区，最后一次性输出
+    buf = io.StringIO()
     for title, data in tables.items():
-        print_subsection(title)
-        print(tabulate(data, headers=["项目", "金额/比率"], 
-                      tablefmt="grid", numalign="right"))
+        print_subsection(title, file=buf)
+        print(format_table_grid(data, headers=["项目", "金额/比率"]), file=buf)
+    sys.stdout.write(buf.getvalue())
 
 def format_money(amount: float) -> str:
     """格式化金额输出"""
@@ -282,12 +363,13 @@ def format_percent(rate: float) -> str:
 
 def print_section(title: str):
     """打印带格式的章节标题"""
-    print(f"\n{Fore.CYAN}{'='*20} {title} {'='*20}{Style.RESET_ALL}")
+    print(f"\n{_color(Fore.CYAN)}{'='*20} {title} {'='*20}{_color(Style.RESET_ALL)}")
 
-def print_subsection(title: str):
+def print_subsection(title: str, file=None):
     """打印带格式的子章节标题"""
-    print(f"\n{Fore.GREEN}{title}{Style.RESET_ALL}")
+    print(f"\n{_color(Fore.GREEN)}{title}{_color(Style.RESET_ALL)}", file=file)
 
+@lru_cache(maxsize=1024)
 def get_rent_deduction_limit(city: str) -> float:
     """获取城市对应的住房租金扣除限额"""
     if city in TaxConstants.SpecialDeductionLimits.TIER_1_CITIES:
@@ -325,11 +407,11 @@ def main():
         print_tax_details(results)
         
     except ValueError:
-        print(f"{Fore.RED}错误：请输入有效的数字！{Style.RESET_ALL}")
+        print(f"{_color(Fore.RED)}错误：请输入有效的数字！{_color(Style.RESET_ALL)}")
     except KeyboardInterrupt:
-        print(f"\n{Fore.YELLOW}程序已终止{Style.RESET_ALL}")
+        print(f"\n{_color(Fore.YELLOW)}程序已终止{_color(Style.RESET_ALL)}")
     except Exception as e:
-        print(f"{Fore.RED}发生错误：{str(e)}{Style.RESET_ALL}")
+        print(f"{_color(Fore.RED)}发生错误：{str(e)}{_color(Style.RESET_ALL)}")
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
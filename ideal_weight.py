@@ -1,4 +1,6 @@
+from bisect import bisect_left
 from dataclasses import dataclass
+from typing import Dict, List, Sequence, Tuple
 import colorama
 from colorama import Fore, Style
 from tabulate import tabulate
@@ -52,7 +54,37 @@ class HealthConstants:
         }
     }
 
+def _coefficient_knots(sex: str) -> Tuple[Tuple[float, ...], Tuple[float, ...]]:
+    """体重系数插值节点：(身高节点, 系数节点)"""
+    coef = HealthConstants.WEIGHT_COEF_REFERENCE[sex]
+    heights = (HealthConstants.HEIGHT_REFERENCE[sex]['min'], 175, 185)
+    return heights, (coef['min'], coef['mid'], coef['max'])
+
+def _composition_ratios(sex: str) -> Tuple[float, float, float]:
+    """体成分比例：(肌肉, 骨骼, 器官)"""
+    comp = HealthConstants.BODY_COMPOSITION[sex]
+    return comp['muscle'], comp['bone'], comp['organ']
+
+def _interpolate(x: float, knots: Sequence[float], values: Sequence[float]) -> float:
+    """分段线性插值：超过末节点取末值，低于首节点沿首段外推"""
+    if x > knots[-1]:
+        return values[-1]
+    i = min(max(bisect_left(knots, x), 1), len(knots) - 1)
+    ratio = (x - knots[i - 1]) / (knots[i] - knots[i - 1])
+    return values[i - 1] + ratio * (values[i] - values[i - 1])
+
 class WeightCalculator:
+    # 体重系数插值表，按是否男性索引
+    COEF_KNOTS = {
+        True: _coefficient_knots('male'),
+        False: _coefficient_knots('female')
+    }
+    # 体成分比例表，按是否男性索引
+    COMPOSITION_RATIOS = {
+        True: _composition_ratios('male'),
+        False: _composition_ratios('female')
+    }
+
     def __init__(self, height: float):
         if height < 100 or height > 250:
             raise ValueError("身高数值不合理")
@@ -60,17 +92,13 @@ class WeightCalculator:
 
     def calculate_weight_coefficient(self, height: float, is_male: bool) -> float:
         """使用分段线性插值计算体重系数"""
-        ref = HealthConstants.HEIGHT_REFERENCE['male' if is_male else 'female']
-        coef = HealthConstants.WEIGHT_COEF_REFERENCE['male' if is_male else 'female']
-        
-        if height > 185:  # 超高身高使用更高系数
-            return coef['max']
-        elif height > 175:  # 高身高区间
-            ratio = (height - 175) / (185 - 175)
-            return coef['mid'] + ratio * (coef['max'] - coef['mid'])
-        else:  # 普通身高区间
-            ratio = (height - ref['min']) / (175 - ref['min'])
-            return coef['min'] + ratio * (coef['mid'] - coef['min'])
+        knots, coefs = self.COEF_KNOTS[is_male]
+        return _interpolate(height, knots, coefs)
+
+    def calculate_weight_coefficient_vec(self, heights: Sequence[float], is_male: bool) -> List[float]:
+        """批量计算多个身高的体重系数"""
+        knots, coefs = self.COEF_KNOTS[is_male]
+        return [_interpolate(height, knots, coefs) for height in heights]
 
     def calculate_weight_range(self, is_male: bool) -> dict:
         """计算理想体重范围"""
@@ -98,12 +126,45 @@ class WeightCalculator:
 
     def calculate_composition(self, weight: float, is_male: bool) -> dict:
         """计算体重组成"""
-        comp = HealthConstants.BODY_COMPOSITION['male' if is_male else 'female']
+        muscle_ratio, bone_ratio, organ_ratio = self.COMPOSITION_RATIOS[is_male]
+        
+        return {
+            'muscle': round(weight * muscle_ratio, 1),
+            'bone': round(weight * bone_ratio, 1),
+            'organ': round(weight * organ_ratio, 1)
+        }
+
+    def calculate_weight_range_vec(self, heights: Sequence[float], is_male: bool) -> dict:
+        """批量计算理想体重范围，各项以列表形式返回"""
+        if any(height < 100 or height > 250 for height in heights):
+            raise ValueError("身高数值不合理")
+        
+        fat_range = HealthConstants.BODY_FAT_MALE if is_male else HealthConstants.BODY_FAT_FEMALE
+        min_factor = 1 + fat_range[0]/100
+        max_factor = 1 + fat_range[1]/100
+        
+        base_weights = [height * coef for height, coef in
+                        zip(heights, self.calculate_weight_coefficient_vec(heights, is_male))]
+        min_weights = [weight * min_factor for weight in base_weights]
+        max_weights = [weight * max_factor for weight in base_weights]
+        
+        return {
+            'min_weight': [round(weight, 1) for weight in min_weights],
+            'max_weight': [round(weight, 1) for weight in max_weights],
+            'composition': {
+                'min': self.calculate_composition_vec(min_weights, is_male),
+                'max': self.calculate_composition_vec(max_weights, is_male)
+            }
+        }
+
+    def calculate_composition_vec(self, weights: Sequence[float], is_male: bool) -> Dict[str, List[float]]:
+        """批量计算体重组成，各成分以列表形式返回"""
+        muscle_ratio, bone_ratio, organ_ratio = self.COMPOSITION_RATIOS[is_male]
         
         return {
-            'muscle': round(weight * comp['muscle'], 1),
-            'bone': round(weight * comp['bone'], 1),
-            'organ': round(weight * comp['organ'], 1)
+            'muscle': [round(weight * muscle_ratio, 1) for weight in weights],
+            'bone': [round(weight * bone_ratio, 1) for weight in weights],
+            'organ': [round(weight * organ_ratio, 1) for weight in weights]
         }
 
 def print_weight_details(height: float):
@@ -1,87 +1,135 @@
+import bisect
 import calendar
-from datetime import datetime, timedelta
+import io
+import math
+import sys
+from datetime import date, datetime, timedelta
+from functools import lru_cache
 from zhdate import ZhDate
 from colorama import init, Fore, Style
 import ephem  # 需要先安装：pip install ephem
 
+# 二十四节气按太阳黄经升序排列（春分为0度），供二分查找
+_TERM_DEGREES = tuple(range(0, 360, 15))
+_TERM_NAMES = (
+    '春分', '清明', '谷雨', '立夏', '小满', '芒种',
+    '夏至', '小暑', '大暑', '立秋', '处暑', '白露',
+    '秋分', '寒露', '霜降', '立冬', '小雪', '大雪',
+    '冬至', '小寒', '大寒', '立春', '雨水', '惊蛰'
+)
+
+# 复用同一个太阳对象，每次调用只需重新compute
+_SUN = ephem.Sun()
+
+@lru_cache(maxsize=512)
 def get_solar_term_date(year, month, day):
     """计算指定年月日的节气"""
-    # 节气列表，包含名称和对应的黄经度数
-    solar_terms = [
-        (315, '立春'), (330, '雨水'), (345, '惊蛰'), (0, '春分'),
-        (15, '清明'), (30, '谷雨'), (45, '立夏'), (60, '小满'),
-        (75, '芒种'), (90, '夏至'), (105, '小暑'), (120, '大暑'),
-        (135, '立秋'), (150, '处暑'), (165, '白露'), (180, '秋分'),
-        (195, '寒露'), (210, '霜降'), (225, '立冬'), (240, '小雪'),
-        (255, '大雪'), (270, '冬至'), (285, '小寒'), (300, '大寒')
-    ]
-    
-    # 计算太阳黄经
-    sun = ephem.Sun()
-    date = ephem.Date(datetime(year, month, day))
-    sun.compute(date)
+    # 计算太阳视黄经（地心、当日历元）
+    observe_date = ephem.Date(datetime(year, month, day))
+    _SUN.compute(observe_date)
     
     # 将弧度转换为角度
-    sun_long = sun.hlong * 180.0 / ephem.pi
-    
-    # 寻找最近的节气
-    for degrees, term_name in solar_terms:
-        if degrees > sun_long:
-            next_term = (degrees, term_name)
-            prev_idx = (solar_terms.index((degrees, term_name)) - 1) % 24
-            prev_term = solar_terms[prev_idx]
-            return prev_term[1], next_term[1]
+    sun_long = ephem.Ecliptic(_SUN, epoch=observe_date).lon * 180.0 / ephem.pi
     
-    return solar_terms[-1][1], solar_terms[0][1]
+    # 二分查找下一个节气，上一个节气即其前一项
+    idx = bisect.bisect_right(_TERM_DEGREES, sun_long) % 24
+    return _TERM_NAMES[(idx - 1) % 24], _TERM_NAMES[idx]
+
+def _sun_apparent_longitude(jd):
+    """太阳视黄经（度），Meeus《天文算法》第25章低精度公式"""
+    t = (jd - 2451545.0) / 36525
+    mean_long = 280.46646 + 36000.76983 * t + 0.0003032 * t * t
+    mean_anomaly = math.radians(357.52911 + 35999.05029 * t - 0.0001537 * t * t)
+    center = ((1.914602 - 0.004817 * t - 0.000014 * t * t) * math.sin(mean_anomaly) +
+              (0.019993 - 0.000101 * t) * math.sin(2 * mean_anomaly) +
+              0.000289 * math.sin(3 * mean_anomaly))
+    omega = math.radians(125.04 - 1934.136 * t)
+    return (mean_long + center - 0.00569 - 0.00478 * math.sin(omega)) % 360
+
+def _solar_term_jd(year, k):
+    """太阳到达黄经 k*15 度的儒略日，按Meeus第27章的修正公式迭代"""
+    target = k * 15
+    # 初值：小寒约在1月5日，之后每约15.2天一个节气
+    order = (k - 19) % 24
+    jd = 2451545.0 + (datetime(year, 1, 5) - datetime(2000, 1, 1, 12)).days + order * 365.2422 / 24
+    for _ in range(4):
+        jd += 58 * math.sin(math.radians(target - _sun_apparent_longitude(jd)))
+    return jd
+
+@lru_cache(maxsize=32)
+def _solar_terms_of_year(year):
+    """指定公历年内的二十四节气（按时间顺序，自小寒至冬至，北京时间的date日期）"""
+    terms = []
+    for order in range(24):
+        k = (19 + order) % 24
+        beijing_jd = _solar_term_jd(year, k) + 8 / 24
+        term_day = datetime(2000, 1, 1, 12) + timedelta(days=beijing_jd - 2451545.0)
+        terms.append((_TERM_NAMES[k], term_day.date()))
+    return tuple(terms)
+
+@lru_cache(maxsize=32)
+def _solar_term_ordinals(year):
+    """指定公历年内各节气日期的序数（与_solar_terms_of_year一一对应），供二分查找"""
+    return tuple(term_date.toordinal() for _, term_date in _solar_terms_of_year(year))
 
 def get_solar_term_dates(year, month, day):
     """获取上一个和下一个节气的具体日期"""
-    # 定义2024年的节气日期（可以按年份扩展）
-    solar_terms_2024 = [
-        ('小寒', 1, 6), ('大寒', 1, 21), ('立春', 2, 4), ('雨水', 2, 19),
-        ('惊蛰', 3, 5), ('春分', 3, 20), ('清明', 4, 4), ('谷雨', 4, 19),
-        ('立夏', 5, 5), ('小满', 5, 20), ('芒种', 6, 5), ('夏至', 6, 21),
-        ('小暑', 7, 7), ('大暑', 7, 22), ('立秋', 8, 7), ('处暑', 8, 23),
-        ('白露', 9, 7), ('秋分', 9, 22), ('寒露', 10, 8), ('霜降', 10, 23),
-        ('立冬', 11, 7), ('小雪', 11, 22), ('大雪', 12, 7), ('冬至', 12, 21)
-    ]
-    
-    current_date = datetime(year, month, day)
-    
-    # 转换节气日期为datetime对象
-    term_dates = []
-    for term, m, d in solar_terms_2024:
-        term_dates.append((term, datetime(year, m, d)))
-    
-    # 找到最近的上一个和下一个节气
-    prev_term = None
-    next_term = None
-    prev_days = None
-    next_days = None
-    
-    for i, (term, date) in enumerate(term_dates):
-        if date.date() <= current_date.date():
-            prev_term = term
-            prev_days = (current_date.date() - date.date()).days
-        elif date.date() > current_date.date():
-            next_term = term
-            next_days = (date.date() - current_date.date()).days
-            break
-    
-    # 处理年末年初的特殊情况
-    if not prev_term:
-        # 如果没有找到上一个节气，说明是年初，需要查看上一年的冬至
-        last_year_dongzhi = datetime(year-1, 12, 21)
-        prev_term = '冬至'
-        prev_days = (current_date.date() - last_year_dongzhi.date()).days
-    
-    if not next_term:
-        # 如果没有找到下一个节气，说明是年末，需要查看下一年的小寒
-        next_year_xiaohan = datetime(year+1, 1, 6)
-        next_term = '小寒'
-        next_days = (next_year_xiaohan.date() - current_date.date()).days
-    
-    return prev_term, prev_days, next_term, next_days
+    current = date(year, month, day).toordinal()
+    
+    # 当年各节气日期，二分查找第一个晚于当天的节气
+    term_dates = _solar_terms_of_year(year)
+    term_days = _solar_term_ordinals(year)
+    i = bisect.bisect_right(term_days, current)
+    
+    # 年初取上一年的冬至，年末取下一年的小寒
+    if i > 0:
+        prev_term, prev_day = term_dates[i - 1][0], term_days[i - 1]
+    else:
+        prev_term, prev_day = _solar_terms_of_year(year - 1)[-1][0], _solar_term_ordinals(year - 1)[-1]
+    
+    if i < len(term_days):
+        next_term, next_day = term_dates[i][0], term_days[i]
+    else:
+        next_term, next_day = _solar_terms_of_year(year + 1)[0][0], _solar_term_ordinals(year + 1)[0]
+    
+    return prev_term, current - prev_day, next_term, next_day - current
+
+# 干支、生肖及农历月日的中文名称
+_HEAVENLY_STEMS = '甲乙丙丁戊己庚辛壬癸'
+_EARTHLY_BRANCHES = '子丑寅卯辰巳午未申酉戌亥'
+_ZODIAC = ('鼠', '牛', '虎', '兔', '龙', '蛇', '马', '羊', '猴', '鸡', '狗', '猪')
+_LUNAR_MONTH_NAMES = ('正', '二', '三', '四', '五', '六', '七', '八', '九', '十', '冬', '腊')
+_LUNAR_DAY_NAMES = ('初一', '初二', '初三', '初四', '初五', '初六', '初七', '初八', '初九', '初十',
+                    '十一', '十二', '十三', '十四', '十五', '十六', '十七', '十八', '十九', '二十',
+                    '廿一', '廿二', '廿三', '廿四', '廿五', '廿六', '廿七', '廿八', '廿九', '三十')
+
+@lru_cache(maxsize=256)
+def get_gz_year(year):
+    """计算农历年份的干支纪年"""
+    return _HEAVENLY_STEMS[(year - 4) % 10] + _EARTHLY_BRANCHES[(year - 4) % 12]
+
+@lru_cache(maxsize=366)
+def _lunar_info(year, month, day):
+    """指定公历日期的农历信息（干支、生肖、农历月日，带颜色）"""
+    lunar_date = ZhDate.from_datetime(datetime(year, month, day))
+    
+    # 获取农历年月日
+    lunar_year = get_gz_year(lunar_date.lunar_year)
+    lunar_month = lunar_date.lunar_month
+    lunar_day = lunar_date.lunar_day
+    
+    # 添加生肖
+    zodiac_year = (lunar_date.lunar_year - 4) % 12
+    
+    return (
+        f"{Fore.GREEN}{lunar_year}{Style.RESET_ALL}"
+        f"({Fore.YELLOW}{_ZODIAC[zodiac_year]}{Style.RESET_ALL})年 "
+        f"{Fore.GREEN}{_LUNAR_MONTH_NAMES[lunar_month-1]}月{_LUNAR_DAY_NAMES[lunar_day-1]}{Style.RESET_ALL}"
+    )
+
+# 日历格子文本（0表示非本月日期的空格子）
+_DAY_CELLS = {d: f'{d:>3}' for d in range(1, 32)}
+_DAY_CELLS[0] = '   '
 
 def show_calendar():
     # 初始化 colorama
@@ -93,6 +141,9 @@ def show_calendar():
               '七月', '八月', '九月', '十月', '十一月', '十二月']
     weekdays = ['日', '一', '二', '三', '四', '五', '六']
     
+    # 所有输出先写入缓冲区，最后一次性输出
+    buf = io.StringIO()
+    
     # 获取当前时间
     now = datetime.now()
     year = now.year
@@ -106,62 +157,32 @@ def show_calendar():
     calendar_width = 25
     title = f"{year}年{months[month-1]}"
 
-    print(f"\n{title:^{calendar_width}}\n")
-    
-    # 修改星期显示，使用蓝色
-    weekday_line = ' '.join(f'{Fore.BLUE}{d:>2}{Style.RESET_ALL}' for d in weekdays)
-    print(weekday_line)
-    
-    # 修改日期显示的格式，当前日期红色，其他日期蓝色
-    for week in cal:
-        line = ' '.join(f'{Fore.RED}{d:>3}{Style.RESET_ALL}' if d == day 
-                       else f'{Fore.BLUE}{d:>3}{Style.RESET_ALL}' if d != 0 
-                       else '   ' for d in week)
-        print(line)
-    
-    # 显示农历信息
-    lunar_date = ZhDate.from_datetime(now)
-    
-    def get_gz_year(year):
-        heavenly_stems = '甲乙丙丁戊己庚辛壬癸'
-        earthly_branches = '子丑寅卯辰巳午未申酉戌亥'
-        return heavenly_stems[(year - 4) % 10] + earthly_branches[(year - 4) % 12]
-
-    # 获取农历年月日
-    lunar_year = get_gz_year(lunar_date.lunar_year)
-    lunar_month = lunar_date.lunar_month
-    lunar_day = lunar_date.lunar_day
-    
-    # 添加生肖
-    zodiac = ['鼠', '牛', '虎', '兔', '龙', '蛇', '马', '羊', '猴', '鸡', '狗', '猪']
-    zodiac_year = (lunar_date.lunar_year - 4) % 12
+    print(f"\n{title:^{calendar_width}}\n", file=buf)
     
-    # 将数字转换为中文
-    lunar_month_names = ['正', '二', '三', '四', '五', '六', '七', '八', '九', '十', '冬', '腊']
-    lunar_day_names = ['初一', '初二', '初三', '初四', '初五', '初六', '初七', '初八', '初九', '初十',
-                      '十一', '十二', '十三', '十四', '十五', '十六', '十七', '十八', '十九', '二十',
-                      '廿一', '廿二', '廿三', '廿四', '廿五', '廿六', '廿七', '廿八', '廿九', '三十']
+    # 星期行与各周日期行拼成一个字符串后一次写出
+    # 星期使用蓝色（整行只需一对颜色码）；当前日期红色，其他日期蓝色，仅在当前日期前后切换颜色
+    cells = dict(_DAY_CELLS)
+    cells[day] = f'{Fore.RED}{day:>3}{Fore.BLUE}'
+    rows = [' '.join(f'{d:>2}' for d in weekdays)]
+    rows.extend(' '.join(cells[d] for d in week) for week in cal)
+    print('\n'.join(f'{Fore.BLUE}{row}{Style.RESET_ALL}' for row in rows), file=buf)
     
     # 获取当前节气和上下节气
     prev_term, prev_days, next_term, next_days = get_solar_term_dates(year, month, day)
     
-    # 修改农历信息显示，添加颜色和节气
-    lunar_info = (
-        f"{Fore.GREEN}{lunar_year}{Style.RESET_ALL}"
-        f"({Fore.YELLOW}{zodiac[zodiac_year]}{Style.RESET_ALL})年 "
-        f"{Fore.GREEN}{lunar_month_names[lunar_month-1]}月{lunar_day_names[lunar_day-1]}{Style.RESET_ALL}"
-    )
-    
-    print("\n")
-    print(f"{lunar_info:^{calendar_width+20}}")  # 增加宽度以确保居中
+    # 农历信息与上下节气信息同样合成一段文本
+    lunar_info = _lunar_info(year, month, day)
+    footer = ["\n", f"{lunar_info:^{calendar_width+20}}"]  # 增加宽度以确保居中
     
-    # 显示上一个节气信息
     if prev_term:
-        print(f"{Fore.CYAN}上一节气：{prev_term} (已过{prev_days}天){Style.RESET_ALL}".center(calendar_width))
+        footer.append(f"{Fore.CYAN}上一节气：{prev_term} (已过{prev_days}天){Style.RESET_ALL}".center(calendar_width))
     
-    # 显示下一个节气信息
     if next_term:
-        print(f"{Fore.CYAN}下一节气：{next_term} (还有{next_days}天){Style.RESET_ALL}".center(calendar_width))
+        footer.append(f"{Fore.CYAN}下一节气：{next_term} (还有{next_days}天){Style.RESET_ALL}".center(calendar_width))
+    
+    print('\n'.join(footer), file=buf)
+    
+    sys.stdout.write(buf.getvalue())
 
 if __name__ == "__main__":
     show_calendar()
\ No newline at end of file
@@ -0,0 +1,47 @@
+import re
+import unicodedata
+from functools import lru_cache
+from typing import List, Sequence
+
+# ANSI颜色转义码不占显示宽度
+_ANSI_ESCAPE = re.compile(r'\x1b\[[0-9;]*m')
+
+@lru_cache(maxsize=None)
+def _char_width(ch: str) -> int:
+    """单个字符的显示宽度"""
+    return 2 if unicodedata.east_asian_width(ch) in ('W', 'F') else 1
+
+def display_width(text: str) -> int:
+    """计算字符串在终端中的显示宽度（中文等全角字符占两列）"""
+    if '\x1b' in text:
+        text = _ANSI_ESCAPE.sub('', text)
+    if text.isascii():
+        return len(text)
+    return sum(map(_char_width, text))
+
+def format_table_grid(rows: Sequence[Sequence[str]], headers: Sequence[str]) -> str:
+    """生成grid样式的表格文本，输出与tabulate(tablefmt="grid")一致（单元格左对齐）"""
+    rows = [[str(cell) for cell in row] for row in rows]
+
+    # 一次遍历得到各单元格显示宽度和列宽，表头至少保留两列留白
+    header_widths = [display_width(h) for h in headers]
+    cell_widths = [[display_width(cell) for cell in row] for row in rows]
+    col_widths = [w + 2 for w in header_widths]
+    for row_widths in cell_widths:
+        col_widths = [max(a, b) for a, b in zip(col_widths, row_widths)]
+
+    def border(fill: str) -> str:
+        return '+' + '+'.join(fill * (w + 2) for w in col_widths) + '+'
+
+    def line(cells: Sequence[str], widths: Sequence[int]) -> str:
+        return '| ' + ' | '.join(
+            cell + ' ' * (col_width - width)
+            for cell, width, col_width in zip(cells, widths, col_widths)
+        ) + ' |'
+
+    separator = border('-')
+    lines: List[str] = [separator, line(headers, header_widths), border('=')]
+    for row, row_widths in zip(rows, cell_widths):
+        lines.append(line(row, row_widths))
+        lines.append(separator)
+    return '\n'.join(lines)
@@ -1,14 +1,18 @@
+from bisect import bisect_left, bisect_right
 from dataclasses import dataclass
-from typing import Dict, List, Tuple
+from functools import lru_cache
+from itertools import accumulate
+from typing import Dict, List, NamedTuple, Tuple
+import io
+import sys
 import colorama
 from colorama import Fore, Style
-from tabulate import tabulate
+from table_format import format_table_grid
 
 # 初始化colorama
 colorama.init()
 
-@dataclass
-class TaxBracket:
+class TaxBracket(NamedTuple):
     """税收等级数据类"""
     lower: float
     upper: float
@@ -70,6 +74,20 @@ class TaxConstants:
         ]
     }
     
+    # 资本利得税率表（按总收入确定适用税率）
+    CAPITAL_GAINS_BRACKETS = {
+        "single": [
+            TaxBracket(0, 44625, 0),
+            TaxBracket(44625, 492300, 0.15),
+            TaxBracket(492300, float('inf'), 0.20)
+        ],
+        "married": [
+            TaxBracket(0, 89250, 0),
+            TaxBracket(89250, 553850, 0.15),
+            TaxBracket(553850, float('inf'), 0.20)
+        ]
+    }
+    
     # 标准扣除额
     STANDARD_DEDUCTION = {
         "single": 14600,
@@ -82,58 +100,90 @@ class TaxConstants:
         "married": 10726
     }
 
+class BracketTable:
+    """税率表按列存储：各级下限、上限、税率及下限处累计税额"""
+    def __init__(self, brackets: List[TaxBracket]):
+        self.lowers = tuple(bracket.lower for bracket in brackets)
+        self.uppers = tuple(bracket.upper for bracket in brackets)
+        self.rates = tuple(bracket.rate for bracket in brackets)
+        self.cum_tax = tuple(accumulate(
+            ((bracket.upper - bracket.lower) * bracket.rate for bracket in brackets[:-1]),
+            initial=0.0
+        ))
+
+    def tax_and_rate(self, amount: float) -> Tuple[float, float]:
+        """按累进税率计算税额及边际税率（amount不小于0）"""
+        i = bisect_right(self.lowers, amount) - 1
+        return self.cum_tax[i] + (amount - self.lowers[i]) * self.rates[i], self.rates[i]
+
+    def tax(self, amount: float) -> float:
+        """按累进税率计算税额（amount不小于0）"""
+        return self.tax_and_rate(amount)[0]
+
+# 申报身份在内部用整数下标表示，各税率表与扣除额按下标存放在元组中
+_FILING_STATUSES = ("single", "married")
+_STATUS_INDEX = {status: i for i, status in enumerate(_FILING_STATUSES)}
+
+_FEDERAL_TABLES = tuple(BracketTable(TaxConstants.FEDERAL_BRACKETS[s]) for s in _FILING_STATUSES)
+_CA_TABLES = tuple(BracketTable(TaxConstants.CA_BRACKETS[s]) for s in _FILING_STATUSES)
+_CAPITAL_GAINS_TABLES = tuple(BracketTable(TaxConstants.CAPITAL_GAINS_BRACKETS[s]) for s in _FILING_STATUSES)
+_STANDARD_DEDUCTIONS = tuple(TaxConstants.STANDARD_DEDUCTION[s] for s in _FILING_STATUSES)
+_CA_STANDARD_DEDUCTIONS = tuple(TaxConstants.CA_STANDARD_DEDUCTION[s] for s in _FILING_STATUSES)
+
+# 预先绑定的格式化方法，打印表格时直接调用
+_money_fmt = "${:,.2f}".format
+_pct_fmt = "{:.1f}%".format
+_money_share_fmt = "${:,.2f} ({:.1f}%)".format
+
 def format_money(amount: float) -> str:
     """格式化金额输出"""
-    return f"${amount:,.2f}"
+    return _money_fmt(amount)
 
 def format_percent(rate: float) -> str:
     """格式化百分比输出"""
-    return f"{rate*100:.1f}%"
+    return _pct_fmt(rate*100)
 
-def print_section(title: str):
+def print_section(title: str, file=None):
     """打印带格式的章节标题"""
-    print(f"\n{Fore.CYAN}{'='*20} {title} {'='*20}{Style.RESET_ALL}")
+    print(f"\n{Fore.CYAN}{'='*20} {title} {'='*20}{Style.RESET_ALL}", file=file)
 
-def print_subsection(title: str):
+def print_subsection(title: str, file=None):
     """打印带格式的子章节标题"""
-    print(f"\n{Fore.GREEN}{title}{Style.RESET_ALL}")
+    print(f"\n{Fore.GREEN}{title}{Style.RESET_ALL}", file=file)
+
+def _federal_tax_and_rate(income: float, status_idx: int) -> Tuple[float, float]:
+    """按申报身份下标计算联邦税及联邦边际税率"""
+    taxable_income = income - _STANDARD_DEDUCTIONS[status_idx]
+    if taxable_income < 0:
+        return 0, 0  # 未超过标准扣除额，新增收入仍不纳税
+    return _FEDERAL_TABLES[status_idx].tax_and_rate(taxable_income)
+
+def calculate_federal_tax_and_rate(income: float, filing_status: str) -> Tuple[float, float]:
+    """计算联邦税及联邦边际税率"""
+    return _federal_tax_and_rate(income, _STATUS_INDEX[filing_status])
 
 def calculate_federal_tax(income: float, filing_status: str) -> float:
     """计算联邦税"""
-    standard_deduction = TaxConstants.STANDARD_DEDUCTION[filing_status]
-    taxable_income = max(0, income - standard_deduction)
-    
-    total_tax = 0
-    remaining_income = taxable_income
-    
-    for bracket in TaxConstants.FEDERAL_BRACKETS[filing_status]:
-        if remaining_income <= 0:
-            break
-        taxable_amount = min(remaining_income, bracket.upper - bracket.lower)
-        total_tax += taxable_amount * bracket.rate
-        remaining_income -= taxable_amount
-    
-    return total_tax
+    return calculate_federal_tax_and_rate(income, filing_status)[0]
+
+def _ca_state_tax_and_rate(income: float, capital_gains: float, status_idx: int) -> Tuple[float, float]:
+    """按申报身份下标计算加州州税及加州边际税率"""
+    taxable_income = income + capital_gains - _CA_STANDARD_DEDUCTIONS[status_idx]
+    if taxable_income < 0:
+        return 0, 0  # 未超过标准扣除额，新增收入仍不纳税
+    return _CA_TABLES[status_idx].tax_and_rate(taxable_income)
+
+def calculate_ca_state_tax_and_rate(income: float, capital_gains: float, filing_status: str) -> Tuple[float, float]:
+    """计算加州州税及加州边际税率"""
+    return _ca_state_tax_and_rate(income, capital_gains, _STATUS_INDEX[filing_status])
 
 def calculate_ca_state_tax(income: float, capital_gains: float, filing_status: str) -> float:
     """计算加州州税"""
-    standard_deduction = TaxConstants.CA_STANDARD_DEDUCTION[filing_status]
-    taxable_income = max(0, income + capital_gains - standard_deduction)
-    
-    total_tax = 0
-    remaining_income = taxable_income
-    
-    for bracket in TaxConstants.CA_BRACKETS[filing_status]:
-        if remaining_income <= 0:
-            break
-        taxable_amount = min(remaining_income, bracket.upper - bracket.lower)
-        total_tax += taxable_amount * bracket.rate
-        remaining_income -= taxable_amount
-    
-    return total_tax
+    return calculate_ca_state_tax_and_rate(income, capital_gains, filing_status)[0]
 
+@lru_cache(maxsize=128)
 def calculate_fica_taxes(income: float) -> Dict[str, float]:
-    """计算FICA税（社保税和医疗保险税）"""
+    """计算FICA税（社保税和医疗保险税，结果为缓存共享对象，请勿修改）"""
     ss_tax = min(income, TaxConstants.SS_LIMIT) * 0.062
     medicare_tax = income * 0.0145
     
@@ -146,47 +196,37 @@ def calculate_fica_taxes(income: float) -> Dict[str, float]:
         "total": ss_tax + medicare_tax + additional_medicare
     }
 
+@lru_cache(maxsize=128)
 def calculate_ca_sdi(income: float) -> float:
     """计算加州SDI（州残障保险）"""
     return min(income, TaxConstants.SDI_LIMIT) * 0.009
 
-def calculate_capital_gains_tax(capital_gains: float, income: float, filing_status: str) -> float:
-    """计算资本利得税"""
-    brackets = {
-        "single": [
-            TaxBracket(0, 44625, 0),
-            TaxBracket(44625, 492300, 0.15),
-            TaxBracket(492300, float('inf'), 0.20)
-        ],
-        "married": [
-            TaxBracket(0, 89250, 0),
-            TaxBracket(89250, 553850, 0.15),
-            TaxBracket(553850, float('inf'), 0.20)
-        ]
-    }
-    
+def _capital_gains_tax(capital_gains: float, income: float, status_idx: int) -> float:
+    """按申报身份下标计算资本利得税"""
+    table = _CAPITAL_GAINS_TABLES[status_idx]
     total_income = income + capital_gains
-    for bracket in brackets[filing_status]:
-        if bracket.lower <= total_income <= bracket.upper:
-            return capital_gains * bracket.rate
+    
+    # 总收入所在税级的税率适用于全部资本利得
+    i = bisect_left(table.uppers, total_income)
+    if i < len(table.rates) and table.lowers[i] <= total_income:
+        return capital_gains * table.rates[i]
     
     return capital_gains * 0.20
 
-def calculate_marginal_rates(income: float, filing_status: str) -> Dict[str, float]:
+def calculate_capital_gains_tax(capital_gains: float, income: float, filing_status: str) -> float:
+    """计算资本利得税"""
+    return _capital_gains_tax(capital_gains, income, _STATUS_INDEX[filing_status])
+
+def calculate_marginal_rates(income: float, filing_status: str, capital_gains: float = 0) -> Dict[str, float]:
     """计算边际税率"""
-    # 获取联邦和加州的边际税率
-    federal_rate = 0
-    for bracket in TaxConstants.FEDERAL_BRACKETS[filing_status]:
-        if bracket.lower <= income <= bracket.upper:
-            federal_rate = bracket.rate
-            break
-    
-    ca_rate = 0
-    for bracket in TaxConstants.CA_BRACKETS[filing_status]:
-        if bracket.lower <= income <= bracket.upper:
-            ca_rate = bracket.rate
-            break
-    
+    # 获取联邦和加州的边际税率（按扣除标准扣除额后的应税收入所在税级）
+    status_idx = _STATUS_INDEX[filing_status]
+    federal_rate = _federal_tax_and_rate(income, status_idx)[1]
+    ca_rate = _ca_state_tax_and_rate(income, capital_gains, status_idx)[1]
+    return combine_marginal_rates(income, federal_rate, ca_rate)
+
+def combine_marginal_rates(income: float, federal_rate: float, ca_rate: float) -> Dict[str, float]:
+    """在联邦和加州边际税率基础上加入工资税边际税率"""
     # FICA税率
     fica_rate = 0.0145  # 基础医疗保险税率
     if income <= TaxConstants.SS_LIMIT:
@@ -224,7 +264,7 @@ def print_marginal_rates(income: float, filing_status: str):
     print(f"  总边际税率：{format_percent(rates['total'])}")
     print(f"  额外收入$100的税收：{format_money(rates['total']*100)}")
 
-@dataclass
+@dataclass(frozen=True)
 class TaxResult:
     """税收计算结果数据类"""
     federal_tax: float
@@ -237,22 +277,29 @@ class TaxResult:
     marginal_rates: Dict[str, float]
 
 def calculate_tax_results(annual_income: float, capital_gains: float, actual_401k: float) -> Dict[str, TaxResult]:
-    """计算所有税收结果"""
+    """计算所有税收结果（输入按美分取整后缓存，结果为共享对象，请勿修改）"""
+    return _calculate_tax_results(round(annual_income, 2), round(capital_gains, 2), round(actual_401k, 2))
+
+@lru_cache(maxsize=128)
+def _calculate_tax_results(annual_income: float, capital_gains: float, actual_401k: float) -> Dict[str, TaxResult]:
+    """按已取整的输入计算所有税收结果"""
     results = {}
     adjusted_income = annual_income - actual_401k
+    total_income = annual_income + capital_gains
+    
+    # 工资税与申报身份无关，两种身份共用
+    fica_taxes = calculate_fica_taxes(annual_income)
+    sdi_tax = calculate_ca_sdi(annual_income)
     
-    for status in ["single", "married"]:
-        federal_tax = calculate_federal_tax(adjusted_income, status)
-        capital_gains_tax = calculate_capital_gains_tax(capital_gains, adjusted_income, status)
-        fica_taxes = calculate_fica_taxes(annual_income)
-        ca_tax = calculate_ca_state_tax(adjusted_income, capital_gains, status)
-        sdi_tax = calculate_ca_sdi(annual_income)
+    for idx, status in enumerate(_FILING_STATUSES):
+        federal_tax, federal_rate = _federal_tax_and_rate(adjusted_income, idx)
+        capital_gains_tax = _capital_gains_tax(capital_gains, adjusted_income, idx)
+        ca_tax, ca_rate = _ca_state_tax_and_rate(adjusted_income, capital_gains, idx)
         
         total_tax = (federal_tax + capital_gains_tax + ca_tax + 
                     fica_taxes["total"] + sdi_tax)
-        total_income = annual_income + capital_gains
         net_income = total_income - total_tax - actual_401k
-        marginal_rates = calculate_marginal_rates(adjusted_income, status)
+        marginal_rates = combine_marginal_rates(adjusted_income, federal_rate, ca_rate)
         
         results[status] = TaxResult(
             federal_tax=federal_tax,
@@ -273,102 +320,108 @@ def print_comparison_tables(annual_income: float, capital_gains: float = 0, maxi
     total_income = annual_income + capital_gains
     results = calculate_tax_results(annual_income, capital_gains, actual_401k)
     
-    print_section(f"{TaxConstants.YEAR}年税收分析")
+    # 所有输出先写入缓冲区，最后一次性输出
+    buf = io.StringIO()
+    print_section(f"{TaxConstants.YEAR}年税收分析", file=buf)
     
     # 收入概况
-    print_subsection("收入概况")
-    print(f"总工资收入：{format_money(annual_income)}")
-    print(f"401(k)供款：{format_money(actual_401k)}")
-    print(f"调整后收入：{format_money(annual_income - actual_401k)}")
-    print(f"资本利得：{format_money(capital_gains)}")
+    print_subsection("收入概况", file=buf)
+    print(f"总工资收入：{_money_fmt(annual_income)}", file=buf)
+    print(f"401(k)供款：{_money_fmt(actual_401k)}", file=buf)
+    print(f"调整后收入：{_money_fmt(annual_income - actual_401k)}", file=buf)
+    print(f"资本利得：{_money_fmt(capital_gains)}", file=buf)
+    
+    def _amt(amount: float) -> str:
+        """金额及其占总收入比例"""
+        return _money_share_fmt(amount, amount/total_income*100)
     
     # 税收对比表格
     tables = {
         "税前扣除": [
-            ["401(k)供款", format_money(actual_401k), format_money(actual_401k)],
+            ["401(k)供款", _money_fmt(actual_401k), _money_fmt(actual_401k)],
             ["联邦标准扣除额", 
-             format_money(TaxConstants.STANDARD_DEDUCTION["single"]),
-             format_money(TaxConstants.STANDARD_DEDUCTION["married"])],
+             _money_fmt(TaxConstants.STANDARD_DEDUCTION["single"]),
+             _money_fmt(TaxConstants.STANDARD_DEDUCTION["married"])],
             ["加州标准扣除额",
-             format_money(TaxConstants.CA_STANDARD_DEDUCTION["single"]),
-             format_money(TaxConstants.CA_STANDARD_DEDUCTION["married"])]
+             _money_fmt(TaxConstants.CA_STANDARD_DEDUCTION["single"]),
+             _money_fmt(TaxConstants.CA_STANDARD_DEDUCTION["married"])]
         ],
         
         "联邦税详情": [
             ["联邦所得税", 
-             f"{format_money(results['single'].federal_tax)} ({format_percent(results['single'].federal_tax/total_income)})",
-             f"{format_money(results['married'].federal_tax)} ({format_percent(results['married'].federal_tax/total_income)})"],
+             _amt(results['single'].federal_tax),
+             _amt(results['married'].federal_tax)],
             ["资本利得税",
-             f"{format_money(results['single'].capital_gains_tax)} ({format_percent(results['single'].capital_gains_tax/total_income)})",
-             f"{format_money(results['married'].capital_gains_tax)} ({format_percent(results['married'].capital_gains_tax/total_income)})"]
+             _amt(results['single'].capital_gains_tax),
+             _amt(results['married'].capital_gains_tax)]
         ],
         
         "加州税详情": [
             ["加州州税",
-             f"{format_money(results['single'].ca_tax)} ({format_percent(results['single'].ca_tax/total_income)})",
-             f"{format_money(results['married'].ca_tax)} ({format_percent(results['married'].ca_tax/total_income)})"]
+             _amt(results['single'].ca_tax),
+             _amt(results['married'].ca_tax)]
         ],
         
         "工资税详情": [
             ["社保税",
-             f"{format_money(results['single'].fica_taxes['social_security'])} ({format_percent(results['single'].fica_taxes['social_security']/total_income)})",
-             f"{format_money(results['married'].fica_taxes['social_security'])} ({format_percent(results['married'].fica_taxes['social_security']/total_income)})"],
+             _amt(results['single'].fica_taxes['social_security']),
+             _amt(results['married'].fica_taxes['social_security'])],
             ["医疗保险税",
-             f"{format_money(results['single'].fica_taxes['medicare'])} ({format_percent(results['single'].fica_taxes['medicare']/total_income)})",
-             f"{format_money(results['married'].fica_taxes['medicare'])} ({format_percent(results['married'].fica_taxes['medicare']/total_income)})"],
+             _amt(results['single'].fica_taxes['medicare']),
+             _amt(results['married'].fica_taxes['medicare'])],
             ["额外医疗保险税",
-             f"{format_money(results['single'].fica_taxes['additional_medicare'])} ({format_percent(results['single'].fica_taxes['additional_medicare']/total_income)})",
-             f"{format_money(results['married'].fica_taxes['additional_medicare'])} ({format_percent(results['married'].fica_taxes['additional_medicare']/total_income)})"],
+             _amt(results['single'].fica_taxes['additional_medicare']),
+             _amt(results['married'].fica_taxes['additional_medicare'])],
             ["加州SDI",
-             f"{format_money(results['single'].sdi_tax)} ({format_percent(results['single'].sdi_tax/total_income)})",
-             f"{format_money(results['married'].sdi_tax)} ({format_percent(results['married'].sdi_tax/total_income)})"]
+             _amt(results['single'].sdi_tax),
+             _amt(results['married'].sdi_tax)]
         ],
         
         "总体税收情况": [
             ["联邦税总额",
-             f"{format_money(results['single'].federal_tax + results['single'].capital_gains_tax)} ({format_percent((results['single'].federal_tax + results['single'].capital_gains_tax)/total_income)})",
-             f"{format_money(results['married'].federal_tax + results['married'].capital_gains_tax)} ({format_percent((results['married'].federal_tax + results['married'].capital_gains_tax)/total_income)})"],
+             _amt(results['single'].federal_tax + results['single'].capital_gains_tax),
+             _amt(results['married'].federal_tax + results['married'].capital_gains_tax)],
             ["加州税总额",
-             f"{format_money(results['single'].ca_tax)} ({format_percent(results['single'].ca_tax/total_income)})",
-             f"{format_money(results['married'].ca_tax)} ({format_percent(results['married'].ca_tax/total_income)})"],
+             _amt(results['single'].ca_tax),
+             _amt(results['married'].ca_tax)],
             ["工资税总额",
-             f"{format_money(results['single'].fica_taxes['total'] + results['single'].sdi_tax)} ({format_percent((results['single'].fica_taxes['total'] + results['single'].sdi_tax)/total_income)})",
-             f"{format_money(results['married'].fica_taxes['total'] + results['married'].sdi_tax)} ({format_percent((results['married'].fica_taxes['total'] + results['married'].sdi_tax)/total_income)})"],
+             _amt(results['single'].fica_taxes['total'] + results['single'].sdi_tax),
+             _amt(results['married'].fica_taxes['total'] + results['married'].sdi_tax)],
             ["总税收",
-             f"{format_money(results['single'].total_tax)} ({format_percent(results['single'].total_tax/total_income)})",
-             f"{format_money(results['married'].total_tax)} ({format_percent(results['married'].total_tax/total_income)})"],
+             _amt(results['single'].total_tax),
+             _amt(results['married'].total_tax)],
             ["税后年收入",
-             format_money(results['single'].net_income),
-             format_money(results['married'].net_income)],
+             _money_fmt(results['single'].net_income),
+             _money_fmt(results['married'].net_income)],
             ["税后月收入",
-             format_money(results['single'].net_income/12),
-             format_money(results['married'].net_income/12)]
+             _money_fmt(results['single'].net_income/12),
+             _money_fmt(results['married'].net_income/12)]
         ],
         
         "边际税率分析": [
             ["联邦边际税率",
-             format_percent(results['single'].marginal_rates['federal']),
-             format_percent(results['married'].marginal_rates['federal'])],
+             _pct_fmt(results['single'].marginal_rates['federal']*100),
+             _pct_fmt(results['married'].marginal_rates['federal']*100)],
             ["加州边际税率",
-             format_percent(results['single'].marginal_rates['california']),
-             format_percent(results['married'].marginal_rates['california'])],
+             _pct_fmt(results['single'].marginal_rates['california']*100),
+             _pct_fmt(results['married'].marginal_rates['california']*100)],
             ["FICA边际税率",
-             format_percent(results['single'].marginal_rates['fica']),
-             format_percent(results['married'].marginal_rates['fica'])],
+             _pct_fmt(results['single'].marginal_rates['fica']*100),
+             _pct_fmt(results['married'].marginal_rates['fica']*100)],
             ["SDI边际税率",
-             format_percent(results['single'].marginal_rates['sdi']),
-             format_percent(results['married'].marginal_rates['sdi'])],
+             _pct_fmt(results['single'].marginal_rates['sdi']*100),
+             _pct_fmt(results['married'].marginal_rates['sdi']*100)],
             ["总边际税率",
-             format_percent(results['single'].marginal_rates['total']),
-             format_percent(results['married'].marginal_rates['total'])]
+             _pct_fmt(results['single'].marginal_rates['total']*100),
+             _pct_fmt(results['married'].marginal_rates['total']*100)]
         ]
     }
     
     # 打印所有表格
     for title, data in tables.items():
-        print_subsection(title)
-        print(tabulate(data, headers=["项目", "单身申报", "夫妻共同申报"], 
-                      tablefmt="grid", numalign="right"))
+        print_subsection(title, file=buf)
+        print(format_table_grid(data, headers=["项目", "单身申报", "夫妻共同申报"]), file=buf)
+    sys.stdout.write(buf.getvalue())
 
 def main():
     """主函数"""